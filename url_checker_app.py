@@ -1,10 +1,15 @@
 import streamlit as st
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import aiohttp
+import asyncio
+from lxml import etree, html as lxhtml
 import pandas as pd
-from urllib.parse import urljoin, urlparse
-import time
+import numpy as np
+from urllib.parse import urljoin, urlsplit
 import re
+import html
 from io import StringIO
 
 # Set page configuration
@@ -66,60 +71,169 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def get_page_data(url):
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Request timeout in seconds, and its aiohttp equivalent for bulk fetching
+REQUEST_TIMEOUT = 10
+FETCH_TIMEOUT = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+
+# Accepted names (case-insensitive) for the URL column of an uploaded CSV
+URL_COLUMNS = {'url', 'urls', 'link', 'links'}
+
+# Maximum number of requests in flight during bulk analysis
+MAX_CONCURRENT_REQUESTS = 20
+
+# Cap on how much of a page body is downloaded, and the read size used to get there
+MAX_CONTENT_BYTES = 256 * 1024
+CHUNK_SIZE = 16 * 1024
+
+# All SEO tags we inspect live in <head>, so the body never needs parsing
+HEAD_END = re.compile(rb'</head\s*>', re.IGNORECASE)
+
+# Precompiled XPath lookups for the SEO tags. Attribute values are lowercased
+# so these match the same tags as the case-insensitive regexes below
+def xpath_lower(attribute):
+    """XPath 1.0 expression lowercasing an attribute value"""
+    return f"translate({attribute}, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')"
+
+XP_TITLE = etree.XPath('//title/text()')
+XP_CANONICAL = etree.XPath(f'//link[contains(concat(" ", normalize-space({xpath_lower("@rel")}), " "), " canonical ")]/@href')
+XP_ROBOTS = etree.XPath(f'//meta[{xpath_lower("@name")}="robots"]/@content')
+XP_DESCRIPTION = etree.XPath(f'//meta[{xpath_lower("@name")}="description"]/@content')
+XP_TAGS = (XP_TITLE, XP_CANONICAL, XP_ROBOTS, XP_DESCRIPTION)
+
+# Regex fast path for the same tags, each paired with a marker that tells us
+# the tag exists when its regex misses (e.g. unusual attribute order)
+REGEX_TAGS = [
+    (re.compile(rb'<title(?:\s[^>]*)?>(?P<value>.*?)</title>', re.IGNORECASE | re.DOTALL), b'<title'),
+    (re.compile(rb'<link[^>]*\srel=["\']canonical["\'][^>]*\shref=(["\'])(?P<value>.*?)\1', re.IGNORECASE | re.DOTALL), b'canonical'),
+    (re.compile(rb'<meta[^>]*\sname=["\']robots["\'][^>]*\scontent=(["\'])(?P<value>.*?)\1', re.IGNORECASE | re.DOTALL), b'robots'),
+    (re.compile(rb'<meta[^>]*\sname=["\']description["\'][^>]*\scontent=(["\'])(?P<value>.*?)\1', re.IGNORECASE | re.DOTALL), b'description'),
+]
+
+# Comments, scripts and styles can contain tag-like text the regexes must not see
+NON_MARKUP = re.compile(
+    rb'<!--.*?-->|<script\b.*?</script\s*>|<style\b.*?</style\s*>',
+    re.IGNORECASE | re.DOTALL
+)
+
+def normalize_url(url):
+    """Add protocol if missing"""
+    url = str(url).strip()
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    return url
+
+def url_key(url):
+    """Comparable form of a URL, ignoring host case, trailing slashes and fragments"""
+    parts = urlsplit(url)
+    return (parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/') or '/', parts.query)
+
+def error_result(url, error):
+    """Build the result row for a URL that could not be analyzed"""
+    return {
+        'url': url,
+        'status_code': 'Error',
+        'canonical_url': 'Error',
+        'is_self_referring': False,
+        'noindex_found': False,
+        'nofollow_found': False,
+        'meta_title': None,
+        'title_length': 0,
+        'meta_description': None,
+        'desc_length': 0,
+        'error': str(error)
+    }
+
+def first_match(xpath, tree):
+    """Return the first string matched by a compiled XPath, or None"""
+    if tree is None:
+        return None
+    matches = xpath(tree)
+    return str(matches[0]) if matches else None
+
+def xpath_tags(head):
+    """Extract (title, canonical, robots, description) by parsing the head with lxml"""
+    # An empty document has no tags to find
+    tree = lxhtml.fromstring(head) if head.strip() else None
+    return [first_match(xpath, tree) for xpath in XP_TAGS]
+
+def regex_tags(head):
     """
-    Fetch and analyze a single URL for SEO elements
+    Extract (title, canonical, robots, description) with regexes, or return
+    None if a tag is present in a shape the regexes don't cover
     """
+    head = NON_MARKUP.sub(b'', head)
+    lowered = head.lower()
+    if b'<!--' in head or b'<script' in lowered or b'<style' in lowered:
+        # Unterminated comment, script or style, leave it to lxml
+        return None
+    
+    tags = []
+    for pattern, marker in REGEX_TAGS:
+        match = pattern.search(head)
+        if match:
+            tags.append(html.unescape(match.group('value').decode('utf-8')))
+        elif marker in lowered:
+            return None
+        else:
+            tags.append(None)
+    return tags
+
+def extract_tags(head):
+    """Extract (title, canonical, robots, description) from the page head"""
     try:
-        # Add protocol if missing
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-        
-        # Make request with timeout and headers
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=10, allow_redirects=True)
-        status_code = response.status_code
-        
-        # Parse HTML
-        soup = BeautifulSoup(response.content, 'html.parser')
+        tags = regex_tags(head)
+    except UnicodeDecodeError:
+        # Not UTF-8, let lxml work out the page encoding
+        tags = None
+    return tags if tags is not None else xpath_tags(head)
+
+def head_complete(buffer, new_bytes):
+    """Whether a download buffer already holds the whole <head> or hit the size cap"""
+    if len(buffer) >= MAX_CONTENT_BYTES:
+        return True
+    # Only rescan the newly read bytes, with some slack for a tag split across chunks
+    start = max(0, len(buffer) - new_bytes - 16)
+    return HEAD_END.search(buffer, start) is not None
+
+def head_only(content):
+    """Truncate HTML bytes right after the closing </head> tag, if present"""
+    match = HEAD_END.search(content)
+    return content[:match.end()] if match else content
+
+def parse_page_data(content, status_code, url, final_url):
+    """
+    Analyze fetched HTML content for SEO elements
+    """
+    try:
+        content = head_only(content)
         
-        # Get canonical tag
-        canonical_tag = soup.find('link', {'rel': 'canonical'})
-        canonical_url = canonical_tag.get('href') if canonical_tag else None
+        meta_title, canonical_url, robots_meta, meta_description = extract_tags(content)
         
         # Check if canonical is self-referring
         if canonical_url:
             # Handle relative URLs
-            canonical_url = urljoin(url, canonical_url)
-            is_self_referring = canonical_url.rstrip('/') == response.url.rstrip('/')
+            if not canonical_url.startswith(('http://', 'https://')):
+                canonical_url = urljoin(url, canonical_url)
+            is_self_referring = url_key(canonical_url) == url_key(final_url)
         else:
             is_self_referring = False
             canonical_url = "Not found"
         
-        # Check for noindex
-        noindex_found = False
-        robots_meta = soup.find('meta', {'name': 'robots'})
-        if robots_meta:
-            content = robots_meta.get('content', '').lower()
-            noindex_found = 'noindex' in content
-        
-        # Check for nofollow
-        nofollow_found = False
-        if robots_meta:
-            content = robots_meta.get('content', '').lower()
-            nofollow_found = 'nofollow' in content
+        # Check for noindex / nofollow
+        robots_content = robots_meta.lower() if robots_meta is not None else ''
+        noindex_found = 'noindex' in robots_content
+        nofollow_found = 'nofollow' in robots_content
         
         # Get meta title
-        title_tag = soup.find('title')
-        meta_title = title_tag.get_text().strip() if title_tag else None
+        meta_title = meta_title.strip() if meta_title is not None else None
         title_length = len(meta_title) if meta_title else 0
         
         # Get meta description
-        desc_tag = soup.find('meta', {'name': 'description'})
-        meta_description = desc_tag.get('content').strip() if desc_tag else None
+        meta_description = meta_description.strip() if meta_description is not None else None
         desc_length = len(meta_description) if meta_description else 0
         
         return {
@@ -136,41 +250,139 @@ def get_page_data(url):
             'error': None
         }
         
-    except requests.exceptions.RequestException as e:
-        return {
-            'url': url,
-            'status_code': 'Error',
-            'canonical_url': 'Error',
-            'is_self_referring': False,
-            'noindex_found': False,
-            'nofollow_found': False,
-            'meta_title': None,
-            'title_length': 0,
-            'meta_description': None,
-            'desc_length': 0,
-            'error': str(e)
-        }
     except Exception as e:
-        return {
-            'url': url,
-            'status_code': 'Error',
-            'canonical_url': 'Error',
-            'is_self_referring': False,
-            'noindex_found': False,
-            'nofollow_found': False,
-            'meta_title': None,
-            'title_length': 0,
-            'meta_description': None,
-            'desc_length': 0,
-            'error': str(e)
-        }
+        return error_result(url, e)
+
+@st.cache_resource
+def get_session():
+    """Shared HTTP session so keep-alive connections survive across URLs and reruns"""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(
+        pool_connections=50,
+        pool_maxsize=50,
+        max_retries=Retry(total=2, backoff_factor=0.2)
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def is_html(content_type):
+    """Whether a Content-Type header may carry an HTML document"""
+    return not content_type or 'html' in content_type.lower()
+
+def fetch_page(url):
+    """Fetch a single URL, returning (content, status_code, final_url)"""
+    with get_session().get(url, timeout=REQUEST_TIMEOUT, allow_redirects=True, stream=True) as response:
+        # Only download HTML pages, and stop as soon as the <head> is complete
+        buffer = bytearray()
+        if is_html(response.headers.get('Content-Type')):
+            for chunk in response.iter_content(CHUNK_SIZE):
+                buffer += chunk
+                if head_complete(buffer, len(chunk)):
+                    break
+        return bytes(buffer), response.status_code, response.url
+
+class PageNotCached(Exception):
+    """Raised by cached_page_data for a LOOKUP_ONLY call on an uncached URL"""
+
+# Passed as cached_page_data(url, LOOKUP_ONLY) to read the cache without fetching
+LOOKUP_ONLY = object()
+
+@st.cache_data(ttl=3600, max_entries=10_000, show_spinner=False)
+def cached_page_data(url, _fetched=None):
+    """
+    Analyze a normalized URL, cached per URL. The page is fetched unless an
+    already fetched (content, status_code, final_url) payload is passed in
+    _fetched, which is not part of the cache key. Fetch errors are raised
+    rather than returned so that failures are never cached.
+    """
+    if _fetched is LOOKUP_ONLY:
+        raise PageNotCached(url)
+    content, status_code, final_url = _fetched if _fetched is not None else fetch_page(url)
+    return parse_page_data(content, status_code, url, final_url)
+
+def get_page_data(url):
+    """
+    Fetch and analyze a single URL for SEO elements
+    """
+    url = normalize_url(url)
+    try:
+        return cached_page_data(url)
+    except requests.exceptions.RequestException as e:
+        return error_result(url, e)
+
+async def fetch(session, semaphore, url):
+    """Fetch a single URL, returning (content, status_code, final_url)"""
+    async with semaphore:
+        async with session.get(url, timeout=FETCH_TIMEOUT) as response:
+            buffer = bytearray()
+            if is_html(response.headers.get('Content-Type')):
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    buffer += chunk
+                    if head_complete(buffer, len(chunk)):
+                        break
+            return bytes(buffer), response.status, str(response.url)
+
+async def fetch_all(urls, on_progress=None):
+    """
+    Fetch all URLs concurrently, bounded by MAX_CONCURRENT_REQUESTS.
+    on_progress(done, total) is called about every 2% of completed URLs.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    step = max(1, len(urls) // 50)
+    done = 0
+    
+    async def tracked_fetch(session, url):
+        nonlocal done
+        try:
+            return await fetch(session, semaphore, url)
+        finally:
+            done += 1
+            if on_progress and (done % step == 0 or done == len(urls)):
+                on_progress(done, len(urls))
+    
+    async with aiohttp.ClientSession(headers=HEADERS) as session:
+        return await asyncio.gather(
+            *[tracked_fetch(session, url) for url in urls],
+            return_exceptions=True
+        )
+
+def analyze_urls(urls, on_progress=None):
+    """
+    Fetch and analyze a list of URLs concurrently. Cached URLs are reused and
+    only the cache misses are fetched, so on_progress counts misses only.
+    """
+    urls = [normalize_url(url) for url in urls]
+    
+    results = {}
+    misses = []
+    for url in dict.fromkeys(urls):
+        try:
+            results[url] = cached_page_data(url, LOOKUP_ONLY)
+        except PageNotCached:
+            misses.append(url)
+    
+    fetched = asyncio.run(fetch_all(misses, on_progress)) if misses else []
+    for url, payload in zip(misses, fetched):
+        if isinstance(payload, Exception):
+            # aiohttp timeouts carry no message, fall back to the exception type
+            results[url] = error_result(url, str(payload) or type(payload).__name__)
+        else:
+            results[url] = cached_page_data(url, payload)
+    
+    return [results[url] for url in urls]
+
+# Pre-rendered badges for the most common status codes
+STATUS_HTML = {200: '<span class="status-200">200</span>'}
+STATUS_HTML.update({
+    code: f'<span class="status-error">{code}</span>'
+    for code in (301, 302, 403, 404, 500, 503, 'Error')
+})
 
 def format_status_code(status_code):
     """Format status code with color coding"""
-    if status_code == 200:
-        return f'<span class="status-200">{status_code}</span>'
-    else:
-        return f'<span class="status-error">{status_code}</span>'
+    return STATUS_HTML.get(status_code) or f'<span class="status-error">{status_code}</span>'
 
 def format_canonical_status(is_self_referring, canonical_url):
     """Format canonical status with color coding"""
@@ -218,6 +430,55 @@ def format_meta_content(content, length, field_name):
     else:
         return f'<span class="error-message">❌ Missing {field_name}</span>'
 
+# Cell styles for the bulk results grid, matching the tag colors above
+GOOD_STYLE = 'background-color: #28a745; color: white'
+BAD_STYLE = 'background-color: #dc3545; color: white'
+WARNING_STYLE = 'background-color: #ffc107; color: black'
+MISSING_STYLE = 'color: #dc3545; font-style: italic'
+
+def color_matches(column, good_value):
+    """Green where the column equals good_value, red elsewhere"""
+    return np.where(column.eq(good_value), GOOD_STYLE, BAD_STYLE)
+
+def color_length(column, good_range):
+    """Green for lengths inside good_range, yellow outside"""
+    low, high = good_range
+    return np.where(column.between(low, high), GOOD_STYLE, WARNING_STYLE)
+
+def color_missing(column):
+    """Highlight missing meta content"""
+    return np.where(column.str.startswith('❌'), MISSING_STYLE, '')
+
+def format_results_table(results_df):
+    """Build the color-coded results grid for the bulk analysis"""
+    status = results_df['status_code']
+    
+    table = pd.DataFrame({
+        'URL': results_df['url'],
+        'Status': status.astype(str),
+        'Canonical': np.select(
+            [results_df['canonical_url'].eq("Not found"), results_df['is_self_referring']],
+            ['Not Found', 'Self-referring'],
+            default='Non self-referring'
+        ),
+        'Noindex': np.where(results_df['noindex_found'], 'Present', 'Not Present'),
+        'Nofollow': np.where(results_df['nofollow_found'], 'Present', 'Not Present'),
+        'Title': results_df['meta_title'].fillna('').replace('', '❌ Missing title'),
+        'Title Length': results_df['title_length'],
+        'Description': results_df['meta_description'].fillna('').replace('', '❌ Missing description'),
+        'Description Length': results_df['desc_length'],
+    })
+    
+    return (
+        table.style
+        .apply(color_matches, good_value='200', subset=['Status'])
+        .apply(color_matches, good_value='Self-referring', subset=['Canonical'])
+        .apply(color_matches, good_value='Not Present', subset=['Noindex', 'Nofollow'])
+        .apply(color_length, good_range=(30, 60), subset=['Title Length'])
+        .apply(color_length, good_range=(120, 160), subset=['Description Length'])
+        .apply(color_missing, subset=['Title', 'Description'])
+    )
+
 # Sidebar navigation
 st.sidebar.title("🔍 SEO URL Checker")
 st.sidebar.markdown("---")
@@ -312,31 +573,30 @@ else:  # CSV Upload
             df = pd.read_csv(uploaded_file)
             
             # Find URL column
-            url_column = None
-            for col in df.columns:
-                if col.lower() in ['url', 'urls', 'link', 'links']:
-                    url_column = col
-                    break
+            matches = [col for col in df.columns if str(col).lower() in URL_COLUMNS]
+            url_column = matches[0] if matches else None
             
             if url_column is None:
                 st.error("No URL column found. Please ensure your CSV has a column named 'url', 'URL', 'link', or 'links'.")
             else:
-                urls = df[url_column].dropna().tolist()
-                st.success(f"Found {len(urls)} URLs to analyze")
+                # Duplicate URLs are only fetched once
+                urls = df[url_column].dropna().astype(str).str.strip().unique().tolist()
+                if urls:
+                    st.success(f"Found {len(urls)} unique URLs to analyze")
+                else:
+                    st.warning(f"The '{url_column}' column doesn't contain any URLs.")
                 
-                if st.button("🚀 Analyze All URLs", type="primary"):
-                    results = []
+                if st.button("🚀 Analyze All URLs", type="primary", disabled=not urls):
+                    urls = tuple(urls)
                     progress_bar = st.progress(0)
-                    status_text = st.empty()
                     
-                    for i, url in enumerate(urls):
-                        status_text.text(f"Analyzing {i+1}/{len(urls)}: {url}")
-                        result = get_page_data(url)
-                        results.append(result)
-                        progress_bar.progress((i + 1) / len(urls))
-                        time.sleep(0.5)  # Be nice to servers
+                    def show_progress(done, total):
+                        progress_bar.progress(done / total, text=f"Fetched {done}/{total} URLs")
                     
-                    status_text.text("Analysis complete!")
+                    with st.status(f"Analyzing {len(urls)} URLs...", expanded=False) as status:
+                        results = analyze_urls(urls, on_progress=show_progress)
+                        status.update(label="Analysis complete!", state="complete")
+                    progress_bar.empty()
                     
                     # Create results DataFrame
                     results_df = pd.DataFrame(results)
@@ -344,63 +604,43 @@ else:  # CSV Upload
                     # Display results table
                     st.markdown("### 📋 Analysis Results")
                     
-                    # Create formatted HTML table
-                    html_table = "<table style='width:100%; border-collapse: collapse;'>"
-                    html_table += """
-                    <tr style='background-color: #f8f9fa; border: 1px solid #ddd;'>
-                        <th style='padding: 12px; border: 1px solid #ddd;'>URL</th>
-                        <th style='padding: 12px; border: 1px solid #ddd;'>Status</th>
-                        <th style='padding: 12px; border: 1px solid #ddd;'>Canonical</th>
-                        <th style='padding: 12px; border: 1px solid #ddd;'>Noindex</th>
-                        <th style='padding: 12px; border: 1px solid #ddd;'>Nofollow</th>
-                        <th style='padding: 12px; border: 1px solid #ddd;'>Title</th>
-                        <th style='padding: 12px; border: 1px solid #ddd;'>Description</th>
-                    </tr>
-                    """
-                    
-                    for _, row in results_df.iterrows():
-                        html_table += "<tr style='border: 1px solid #ddd;'>"
-                        html_table += f"<td style='padding: 8px; border: 1px solid #ddd; max-width: 200px; word-break: break-all;'>{row['url']}</td>"
-                        html_table += f"<td style='padding: 8px; border: 1px solid #ddd; text-align: center;'>{format_status_code(row['status_code'])}</td>"
-                        html_table += f"<td style='padding: 8px; border: 1px solid #ddd; text-align: center;'>{format_canonical_status(row['is_self_referring'], row['canonical_url'])}</td>"
-                        html_table += f"<td style='padding: 8px; border: 1px solid #ddd; text-align: center;'>{format_noindex_status(row['noindex_found'])}</td>"
-                        html_table += f"<td style='padding: 8px; border: 1px solid #ddd; text-align: center;'>{format_nofollow_status(row['nofollow_found'])}</td>"
-                        html_table += f"<td style='padding: 8px; border: 1px solid #ddd; max-width: 300px;'>{format_meta_content(row['meta_title'], row['title_length'], 'title')}</td>"
-                        html_table += f"<td style='padding: 8px; border: 1px solid #ddd; max-width: 300px;'>{format_meta_content(row['meta_description'], row['desc_length'], 'description')}</td>"
-                        html_table += "</tr>"
-                    
-                    html_table += "</table>"
-                    
-                    st.markdown(html_table, unsafe_allow_html=True)
+                    st.dataframe(
+                        format_results_table(results_df),
+                        use_container_width=True,
+                        height=600,
+                        hide_index=True
+                    )
                     
                     # Download results
-                    csv = results_df.to_csv(index=False)
                     st.download_button(
                         label="📥 Download Results as CSV",
-                        data=csv,
+                        data=results_df.to_csv(index=False),
                         file_name=f"seo_analysis_results_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
                         mime="text/csv"
                     )
                     
-                    # Summary statistics
-                    st.markdown("### 📈 Summary Statistics")
-                    col1, col2, col3, col4 = st.columns(4)
-                    
-                    with col1:
-                        success_count = len([r for r in results if r['status_code'] == 200])
-                        st.metric("✅ Successful Requests", f"{success_count}/{len(results)}")
-                    
-                    with col2:
-                        canonical_issues = len([r for r in results if not r['is_self_referring'] and r['canonical_url'] != "Not found"])
-                        st.metric("⚠️ Canonical Issues", canonical_issues)
-                    
-                    with col3:
-                        noindex_count = len([r for r in results if r['noindex_found']])
-                        st.metric("🚫 Noindex Pages", noindex_count)
+                    # Summary statistics (single pass over the results)
+                    success_count = canonical_issues = noindex_count = missing_titles = 0
+                    for r in results:
+                        success_count += r['status_code'] == 200
+                        canonical_issues += not r['is_self_referring'] and r['canonical_url'] != "Not found"
+                        noindex_count += r['noindex_found']
+                        missing_titles += not r['meta_title']
                     
-                    with col4:
-                        missing_titles = len([r for r in results if not r['meta_title']])
-                        st.metric("📝 Missing Titles", missing_titles)
+                    with st.expander("📈 Summary Statistics", expanded=False):
+                        col1, col2, col3, col4 = st.columns(4)
+                        
+                        with col1:
+                            st.metric("✅ Successful Requests", f"{success_count}/{len(results)}")
+                        
+                        with col2:
+                            st.metric("⚠️ Canonical Issues", canonical_issues)
+                        
+                        with col3:
+                            st.metric("🚫 Noindex Pages", noindex_count)
+                        
+                        with col4:
+                            st.metric("📝 Missing Titles", missing_titles)
         
         except Exception as e:
             st.error(f"Error reading CSV file: {e}")